@@ -1,26 +1,81 @@
 import os
+from dataclasses import dataclass
+from functools import lru_cache
 
 
 from dotenv import load_dotenv
 
-load_dotenv(override=True)
+# Parse .env at most once per process, however many modules import this one
+_LOADED = False
+
+def _load_env():
+    global _LOADED
+    if not _LOADED:
+        load_dotenv(override=True)
+        _LOADED = True
+
+@dataclass(frozen=True)
+class Settings:
+    """Resolved configuration, read from the environment once"""
+    # AWS Configuration
+    aws_region: str
+    aws_access_key: str
+    aws_secret_key: str
+
+    # S3 Configuration
+    bucket_name: str
+
+    # Rekognition Configuration
+    collection_id: str
+
+    # DynamoDB Tables
+    profiles_table: str
+    detected_faces_table: str
+    uploaded_images_table: str
+    face_recognition_table: str
+
+    # API Configuration
+    api_host: str
+    api_port: int
+
+@lru_cache(maxsize=1)
+def get_settings():
+    """Build the Settings object on first use and return the cached instance afterwards"""
+    _load_env()
+    env = os.environ
+    return Settings(
+        aws_region=env.get("AWS_REGION", "us-east-1"),
+        aws_access_key=env.get("AWS_ACCESS_KEY_ID", ""),
+        aws_secret_key=env.get("AWS_SECRET_ACCESS_KEY", ""),
+        bucket_name=env.get("S3_BUCKET", "famouspersons-images-ca"),
+        collection_id=env.get("COLLECTION_ID", "famouspersons"),
+        profiles_table="profiles",
+        detected_faces_table="detected_faces",
+        uploaded_images_table="uploaded_images",
+        face_recognition_table=env.get("DYNAMODB_TABLE", "facerecognition"),
+        api_host=env.get("API_HOST", "0.0.0.0"),
+        api_port=int(env.get("API_PORT", "8000")),
+    )
+
+settings = get_settings()
 
 # AWS Configuration
-AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
-AWS_ACCESS_KEY = os.environ.get("AWS_ACCESS_KEY_ID", "")
-AWS_SECRET_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY", "")
+AWS_REGION = settings.aws_region
+AWS_ACCESS_KEY = settings.aws_access_key
+AWS_SECRET_KEY = settings.aws_secret_key
 
 # S3 Configuration
-BUCKET_NAME = os.environ.get("S3_BUCKET", "famouspersons-images-ca")
+BUCKET_NAME = settings.bucket_name
 
 # Rekognition Configuration
-COLLECTION_ID = os.environ.get("COLLECTION_ID", "famouspersons")
+COLLECTION_ID = settings.collection_id
 
 # DynamoDB Tables
-PROFILES_TABLE = "profiles"
-DETECTED_FACES_TABLE = "detected_faces"
-FACE_RECOGNITION_TABLE = os.environ.get("DYNAMODB_TABLE", "facerecognition")
+PROFILES_TABLE = settings.profiles_table
+DETECTED_FACES_TABLE = settings.detected_faces_table
+UPLOADED_IMAGES_TABLE = settings.uploaded_images_table
+FACE_RECOGNITION_TABLE = settings.face_recognition_table
 
 # API Configuration
-API_HOST = os.environ.get("API_HOST", "0.0.0.0")
-API_PORT = int(os.environ.get("API_PORT", "8000"))
\ No newline at end of file
+API_HOST = settings.api_host
+API_PORT = settings.api_port
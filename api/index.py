@@ -1,34 +1,63 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from decimal import Decimal
 import io
+import json
+import hashlib
+import itertools
 import uuid
+import time
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
 from datetime import datetime
-from PIL import Image
+from PIL import Image, ImageOps
 from typing import List, Optional
 from pydantic import BaseModel, Field
 import os
 import logging
-import json
 
-from dotenv import load_dotenv
-
-load_dotenv(override=True)
+# Table schemas and indexes are shared with the standalone setup script
+from provision import MATCHED_PROFILE_INDEX, FACE_ID_INDEX, provision
+# Settings come from config, which has already loaded .env
+from config import (
+    AWS_REGION, BUCKET_NAME as S3_BUCKET, COLLECTION_ID,
+    PROFILES_TABLE, DETECTED_FACES_TABLE, UPLOADED_IMAGES_TABLE
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api.index")
 
-# Config
-AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
-S3_BUCKET = os.environ.get("S3_BUCKET", "famouspersons-images-ca")
-COLLECTION_ID = os.environ.get("COLLECTION_ID", "famouspersons")
-PROFILES_TABLE = "profiles"
-DETECTED_FACES_TABLE = "detected_faces"
-FACE_RECOGNITION_TABLE = os.environ.get("DYNAMODB_TABLE", "facerecognition")
+# Deployments whose tables and collection already exist can skip the existence checks entirely
+SKIP_STARTUP_CHECKS = os.environ.get("SKIP_STARTUP_CHECKS") == "1"
+
+async def initialize_resources():
+    """Set up the collection and the tables together; between them and warm_s3,
+    each client opens a pooled connection before the first request"""
+    setup = [warm_s3]
+    if not SKIP_STARTUP_CHECKS:
+        setup += [create_rekognition_collection, create_dynamodb_tables]
+    try:
+        await asyncio.gather(*(run_in_threadpool(step) for step in setup))
+    except Exception as e:
+        logger.error(f"Error initializing resources: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Initialize resources in the background so the app starts serving immediately"""
+    setup_task = asyncio.create_task(initialize_resources())
+    yield
+    setup_task.cancel()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,10 +67,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# AWS clients
-s3 = boto3.client('s3', region_name=AWS_REGION)
-rekognition = boto3.client('rekognition', region_name=AWS_REGION)
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+# Compress larger JSON responses such as the /profiles listing
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# AWS clients share one session and one config: a larger connection pool for concurrent requests,
+# adaptive retries for throttling, TCP keep-alive on pooled connections, and bounded timeouts
+# so a stalled connection is retried rather than holding a worker thread for a minute
+BOTO_CONFIG = Config(
+    region_name=AWS_REGION,
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    tcp_keepalive=True,
+    connect_timeout=2,
+    read_timeout=15
+)
+boto_session = boto3.session.Session()
+s3 = boto_session.client('s3', config=BOTO_CONFIG)
+# Rekognition throttles per account TPS, so give adaptive retries more room to back off there
+rekognition = boto_session.client(
+    'rekognition',
+    config=BOTO_CONFIG.merge(Config(retries={'mode': 'adaptive', 'max_attempts': 10}))
+)
+dynamodb = boto_session.resource('dynamodb', config=BOTO_CONFIG)
+dynamodb_client = dynamodb.meta.client
+
+# Table handles are built once rather than through the resource factory on every request
+profiles_table = dynamodb.Table(PROFILES_TABLE)
+faces_table = dynamodb.Table(DETECTED_FACES_TABLE)
+uploads_table = dynamodb.Table(UPLOADED_IMAGES_TABLE)
+
+# Largest image Rekognition accepts inline as Image={'Bytes': ...}
+REKOGNITION_MAX_BYTES = 5 * 1024 * 1024
+# Longest side sent to Rekognition; larger images are downscaled first
+REKOGNITION_MAX_SIDE = 1280
+
+# Large uploads that are streamed to S3 go up in parallel multipart chunks
+TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024, max_concurrency=8)
+
+# Rekognition calls allowed in flight at once across all requests; size it to the account's TPS limit.
+# Waiting happens on the event loop, so queued calls don't tie up threadpool workers
+REKOGNITION_CONCURRENCY = int(os.environ.get("REKOGNITION_CONCURRENCY", "10"))
+# One semaphore per event loop, created on first use: on Python 3.8 a semaphore binds to the loop
+# it was created on, and the app may be served without lifespan or from more than one loop
+_rekognition_slots = weakref.WeakKeyDictionary()
+
+# Uploads are rejected before any work if they aren't one of these types or exceed the size cap
+ALLOWED_UPLOAD_TYPES = {"image/jpeg", "image/jpg", "image/png"}
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+# Faces indexed per group photo (Rekognition allows up to 100); each one is stored in the collection and searched once
+MAX_FACES_PER_IMAGE = int(os.environ.get("MAX_FACES_PER_IMAGE", "100"))
 
 # Data models
 class ProfileCreate(BaseModel):
@@ -70,64 +144,65 @@ class DetectedFaceResponse(DetectedFace):
     pass
 
 def create_dynamodb_tables():
-    """Create required DynamoDB tables if they don't exist"""
-    dynamodb_client = boto3.client('dynamodb', region_name=AWS_REGION)
-    
-    # Define table schemas
-    tables = {
-        PROFILES_TABLE: {
-            "KeySchema": [{'AttributeName': 'profile_id', 'KeyType': 'HASH'}],
-            "AttributeDefinitions": [{'AttributeName': 'profile_id', 'AttributeType': 'S'}]
-        },
-        DETECTED_FACES_TABLE: {
-            "KeySchema": [
-                {'AttributeName': 'detected_face_id', 'KeyType': 'HASH'},
-                {'AttributeName': 'image_id', 'KeyType': 'RANGE'}
-            ],
-            "AttributeDefinitions": [
-                {'AttributeName': 'detected_face_id', 'AttributeType': 'S'},
-                {'AttributeName': 'image_id', 'AttributeType': 'S'}
-            ]
-        },
-        FACE_RECOGNITION_TABLE: {
-            "KeySchema": [{'AttributeName': 'RekognitionId', 'KeyType': 'HASH'}],
-            "AttributeDefinitions": [{'AttributeName': 'RekognitionId', 'AttributeType': 'S'}]
-        }
-    }
-    
-    # Create tables that don't exist
-    for table_name, schema in tables.items():
-        try:
-            # Check if table exists
-            dynamodb_client.describe_table(TableName=table_name)
-            logger.info(f"Table {table_name} already exists")
-        except dynamodb_client.exceptions.ResourceNotFoundException:
-            try:
-                logger.info(f"Creating table {table_name}...")
-                dynamodb_client.create_table(
-                    TableName=table_name,
-                    KeySchema=schema["KeySchema"],
-                    AttributeDefinitions=schema["AttributeDefinitions"],
-                    ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
-                )
-                # Wait for table to be created
-                waiter = dynamodb_client.get_waiter('table_exists')
-                waiter.wait(TableName=table_name)
-                logger.info(f"Created table {table_name}")
-            except Exception as e:
-                logger.error(f"Error creating table {table_name}: {e}")
+    """Create required DynamoDB tables if they don't exist, all creates submitted before waiting on any"""
+    provision(dynamodb=dynamodb_client)
 
 def create_rekognition_collection():
     """Create Rekognition collection if it doesn't exist"""
     try:
-        rekognition.describe_collection(CollectionId=COLLECTION_ID)
+        rekognition.create_collection(CollectionId=COLLECTION_ID)
+        logger.info(f"Created Rekognition collection {COLLECTION_ID}")
+    except rekognition.exceptions.ResourceAlreadyExistsException:
         logger.info(f"Rekognition collection {COLLECTION_ID} already exists")
-    except rekognition.exceptions.ResourceNotFoundException:
-        try:
-            rekognition.create_collection(CollectionId=COLLECTION_ID)
-            logger.info(f"Created Rekognition collection {COLLECTION_ID}")
-        except Exception as e:
-            logger.error(f"Error creating Rekognition collection: {e}")
+    except Exception as e:
+        logger.error(f"Error creating Rekognition collection: {e}")
+
+def warm_s3():
+    """Open and TLS-negotiate a pooled S3 connection so the first upload doesn't pay for it"""
+    try:
+        s3.head_bucket(Bucket=S3_BUCKET)
+    except Exception as e:
+        logger.warning(f"Could not reach S3 bucket {S3_BUCKET}: {e}")
+
+def downscale_image(fp):
+    """Re-encode an image file larger than REKOGNITION_MAX_SIDE as a smaller JPEG; returns None if it already fits"""
+    image = Image.open(fp)
+    if max(image.size) <= REKOGNITION_MAX_SIDE:
+        return None
+    
+    # The re-encoded copy drops EXIF, so bake the orientation into the pixels first
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((REKOGNITION_MAX_SIDE, REKOGNITION_MAX_SIDE), Image.Resampling.LANCZOS)
+    stream = io.BytesIO()
+    image.save(stream, format="JPEG", quality=85)
+    return stream.getvalue()
+
+def prepare_for_rekognition(contents):
+    """Downscale oversize images before sending them to Rekognition; small images pass through unchanged"""
+    return downscale_image(io.BytesIO(contents)) or contents
+
+def check_upload(file):
+    """Reject unsupported or oversize uploads up front; returns the upload's size in bytes"""
+    if file.content_type not in ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(status_code=415, detail="Only JPEG and PNG images are supported")
+    
+    # Size the spooled upload without reading it
+    file.file.seek(0, io.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+    return size
+
+async def call_rekognition(operation, **kwargs):
+    """Invoke a Rekognition operation in the threadpool while holding one of the REKOGNITION_CONCURRENCY slots"""
+    loop = asyncio.get_event_loop()
+    slots = _rekognition_slots.get(loop)
+    if slots is None:
+        slots = _rekognition_slots[loop] = asyncio.Semaphore(REKOGNITION_CONCURRENCY)
+    async with slots:
+        return await run_in_threadpool(operation, **kwargs)
 
 def get_s3_presigned_url(s3_uri, expiration=3600):
     """Generate a pre-signed URL for S3 object"""
@@ -141,132 +216,312 @@ def get_s3_presigned_url(s3_uri, expiration=3600):
     bucket, key = bucket_key
     
     try:
-        url = s3.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': bucket, 'Key': key},
-            ExpiresIn=expiration
-        )
-        return url
+        # Reuse a signature for half its lifetime, so a cached URL always has at least expiration/2 left
+        window = int(time.time()) // max(1, expiration // 2)
+        return _presign(bucket, key, expiration, window)
     except Exception as e:
         logger.error(f"Error generating presigned URL: {e}")
         return s3_uri
 
-@app.on_event("startup")
-async def startup():
-    """Initialize resources on startup"""
-    create_rekognition_collection()
-    create_dynamodb_tables()
+@lru_cache(maxsize=4096)
+def _presign(bucket, key, expiration, window):
+    """Sign a GET URL; cached per (object, expiration, time window) so repeated listings don't re-sign"""
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket, 'Key': key},
+        ExpiresIn=expiration
+    )
+
+def paginate(operation, **kwargs):
+    """Yield every item from a DynamoDB scan or query, following LastEvaluatedKey across pages"""
+    while True:
+        response = operation(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+# Short-lived in-process cache of the profiles table, invalidated whenever a profile is written
+PROFILES_CACHE_TTL = 30
+_profiles_cache = {"items": None, "by_face": {}, "expires": 0.0}
+
+def scan_profiles():
+    """Return all profile items, following scan pagination and serving from cache within the TTL"""
+    now = time.monotonic()
+    if _profiles_cache["items"] is not None and now < _profiles_cache["expires"]:
+        return _profiles_cache["items"]
+    
+    items = list(paginate(
+        profiles_table.scan,
+        ProjectionExpression="profile_id, #name, face_id, profile_image_s3, created_at",
+        ExpressionAttributeNames={"#name": "name"}
+    ))
+    
+    _profiles_cache["items"] = items
+    _profiles_cache["by_face"] = {item['face_id']: item['profile_id'] for item in items if 'face_id' in item}
+    _profiles_cache["expires"] = now + PROFILES_CACHE_TTL
+    return items
+
+def find_profile_id_by_face(face_id):
+    """Look up the profile owning a face through the face_id index, remembering hits;
+    tables created before the index was added fall back to the cached profiles scan"""
+    profile_id = _profiles_cache["by_face"].get(face_id)
+    if profile_id is not None:
+        return profile_id
+    
+    try:
+        response = profiles_table.query(
+            IndexName=FACE_ID_INDEX,
+            KeyConditionExpression="face_id = :face_id",
+            ExpressionAttributeValues={":face_id": face_id},
+            Limit=1
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ValidationException':
+            raise
+        scan_profiles()
+        return _profiles_cache["by_face"].get(face_id)
+    
+    if response['Items']:
+        profile_id = response['Items'][0]['profile_id']
+        _profiles_cache["by_face"][face_id] = profile_id
+    return profile_id
+
+def invalidate_profiles_cache():
+    _profiles_cache["items"] = None
+    mark_profiles_changed()
+
+# Version of the /profiles listing, bumped whenever this process writes a profile or a match.
+# The instance token keeps versions from different processes from colliding
+PROFILES_INSTANCE = uuid.uuid4().hex[:8]
+_profiles_versions = itertools.count(1)
+_profiles_state = {"version": 0}
+
+def mark_profiles_changed():
+    _profiles_state["version"] = next(_profiles_versions)
+
+def profiles_etag():
+    """ETag for the /profiles listing, computed without reading DynamoDB so unchanged polls cost nothing.
+    Writes made by other instances show up once the PROFILES_CACHE_TTL window rolls over"""
+    window = int(time.time()) // PROFILES_CACHE_TTL
+    return f'"{PROFILES_INSTANCE}-{_profiles_state["version"]}-{window}"'
+
+async def process_detected_face(face_record, image_id, s3_uri):
+    """Match one indexed face against profiles; returns the response and the item to store"""
+    face_id = face_record['Face']['FaceId']
+    face_detail = face_record['FaceDetail']
+    
+    # Search for matching profiles
+    match_response = await call_rekognition(
+        rekognition.search_faces,
+        CollectionId=COLLECTION_ID,
+        FaceId=face_id,
+        MaxFaces=1,
+        FaceMatchThreshold=90.0
+    )
+    
+    matched_profile_id = None
+    confidence = None
+    
+    if match_response['FaceMatches']:
+        match = match_response['FaceMatches'][0]
+        matched_face_id = match['Face']['FaceId']
+        
+        # Check if matched face belongs to a profile
+        matched_profile_id = await run_in_threadpool(find_profile_id_by_face, matched_face_id)
+        
+        if matched_profile_id:
+            confidence = float(match['Similarity'])
+    
+    # Store face data in DynamoDB
+    timestamp = datetime.now().isoformat()
+    
+    face_item = {
+        'detected_face_id': face_id,
+        'image_id': image_id,
+        's3_path': s3_uri,
+        'bounding_box': face_detail['BoundingBox'],
+        'timestamp': timestamp
+    }
+    
+    if matched_profile_id:
+        face_item['matched_profile_id'] = matched_profile_id
+    
+    if confidence:
+        face_item['confidence'] = confidence
+    
+    # Convert every float to Decimal for DynamoDB in one pass through the C JSON codec
+    face_item = json.loads(json.dumps(face_item), parse_float=Decimal)
+    
+    # Create response object with HTTPS URL
+    face_response = DetectedFaceResponse(
+        detected_face_id=face_id,
+        image_id=image_id,
+        s3_path=get_s3_presigned_url(s3_uri),
+        matched_profile_id=matched_profile_id,
+        bounding_box=face_detail['BoundingBox'],
+        confidence=confidence,
+        timestamp=timestamp
+    )
+    
+    return face_response, face_item
+
+async def archive_and_index(file, size, s3_key, index_faces):
+    """Archive an upload to S3 and run index_faces on it, sending the image inline whenever it fits"""
+    # S3 archives the original; Rekognition gets a downscaled copy of large images
+    if size <= REKOGNITION_MAX_BYTES:
+        contents = await file.read()
+        rekognition_bytes = await run_in_threadpool(prepare_for_rekognition, contents)
+        upload = partial(s3.put_object, Bucket=S3_BUCKET, Key=s3_key, Body=contents)
+    else:
+        # Downscale straight from the spooled file, then rewind it to stream the original to S3
+        rekognition_bytes = await run_in_threadpool(downscale_image, file.file)
+        file.file.seek(0)
+        upload = partial(s3.upload_fileobj, file.file, S3_BUCKET, s3_key, Config=TRANSFER_CONFIG)
+    
+    if rekognition_bytes and len(rekognition_bytes) <= REKOGNITION_MAX_BYTES:
+        # Index from the bytes in hand, concurrently with archiving the image to S3,
+        # rather than having Rekognition read the image back out of S3
+        _, response = await asyncio.gather(
+            run_in_threadpool(upload),
+            index_faces(Image={'Bytes': rekognition_bytes})
+        )
+    else:
+        # Still too large to send inline, so Rekognition has to read it from S3
+        await run_in_threadpool(upload)
+        response = await index_faces(Image={'S3Object': {'Bucket': S3_BUCKET, 'Name': s3_key}})
+    
+    logger.info(f"Uploaded image to S3: s3://{S3_BUCKET}/{s3_key}")
+    return response
+
+def store_detected_faces(face_items, digest=None, image_id=None):
+    """Persist detected faces in batched writes; run after the response has been sent.
+    With a digest, the upload is then recorded so identical re-uploads can skip Rekognition"""
+    try:
+        with faces_table.batch_writer() as batch:
+            for face_item in face_items:
+                batch.put_item(Item=face_item)
+        logger.info(f"Stored {len(face_items)} detected faces")
+        if any('matched_profile_id' in face_item for face_item in face_items):
+            mark_profiles_changed()
+        
+        # Written only once the faces are stored, so a recorded upload always has its faces
+        if digest:
+            uploads_table.put_item(Item={
+                'digest': digest,
+                'image_id': image_id,
+                'detected_face_ids': [face_item['detected_face_id'] for face_item in face_items],
+                'created_at': datetime.now().isoformat()
+            })
+    except Exception as e:
+        logger.error(f"Error storing detected faces: {e}")
+
+def hash_upload(fp):
+    """SHA-256 of a spooled upload, read in chunks and rewound afterwards"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+        digest.update(chunk)
+    fp.seek(0)
+    return digest.hexdigest()
+
+def find_previous_upload(digest):
+    """Faces stored for an identical earlier upload, with their current matches; None if it's new"""
+    try:
+        upload = uploads_table.get_item(Key={'digest': digest}).get('Item')
+    except ClientError as e:
+        # Deployments without the uploads table simply never short-circuit
+        logger.warning(f"Could not check for duplicate upload: {e}")
+        return None
+    if not upload:
+        return None
+    
+    image_id = upload['image_id']
+    keys = [{'detected_face_id': face_id, 'image_id': image_id} for face_id in upload['detected_face_ids']]
+    items = {}
+    request_items = {DETECTED_FACES_TABLE: {'Keys': keys}} if keys else {}
+    while request_items:
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for item in response['Responses'].get(DETECTED_FACES_TABLE, []):
+            items[item['detected_face_id']] = item
+        request_items = response.get('UnprocessedKeys', {})
+    
+    # Read back from detected_faces so matches made since the first upload are included
+    return [
+        DetectedFaceResponse(
+            detected_face_id=item['detected_face_id'],
+            image_id=image_id,
+            s3_path=get_s3_presigned_url(item['s3_path']),
+            matched_profile_id=item.get('matched_profile_id'),
+            bounding_box={key: float(value) for key, value in item['bounding_box'].items()},
+            confidence=float(item['confidence']) if 'confidence' in item else None,
+            timestamp=item['timestamp']
+        )
+        for item in (items.get(face_id) for face_id in upload['detected_face_ids'])
+        if item
+    ]
 
 @app.get("/")
 async def root():
     return {"message": "Face Recognition API is running"}
 
 @app.post("/upload_image", response_model=List[DetectedFaceResponse])
-async def upload_image(file: UploadFile = File(...), description: str = Form(None)):
+async def upload_image(background_tasks: BackgroundTasks, file: UploadFile = File(...), description: str = Form(None)):
     """Upload a group image and detect faces"""
     try:
-        # Read image and upload to S3
-        image_content = await file.read()
+        size = check_upload(file)
+        
+        # An identical photo has already been archived, indexed and matched; reuse that work
+        digest = await run_in_threadpool(hash_upload, file.file)
+        previous = await run_in_threadpool(find_previous_upload, digest)
+        if previous is not None:
+            logger.info(f"Duplicate upload {digest}, returning its stored faces")
+            return previous
+        
         image_id = str(uuid.uuid4())
         s3_key = f"groups/{image_id}.jpg"
-        
-        s3.upload_fileobj(io.BytesIO(image_content), S3_BUCKET, s3_key)
         s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
-        logger.info(f"Uploaded image to S3: {s3_uri}")
         
-        # Detect faces
-        response = rekognition.detect_faces(
-            Image={'S3Object': {'Bucket': S3_BUCKET, 'Name': s3_key}},
-            Attributes=['DEFAULT']
+        # Index every face in one call; its FaceRecords carry both the FaceId and the bounding box,
+        # so a separate detect_faces pass and per-face index_faces calls aren't needed
+        index_faces = partial(
+            call_rekognition,
+            rekognition.index_faces,
+            CollectionId=COLLECTION_ID,
+            MaxFaces=MAX_FACES_PER_IMAGE
         )
-        logger.info(f"Detected {len(response['FaceDetails'])} faces")
+        response = await archive_and_index(file, size, s3_key, index_faces)
+        logger.info(f"Indexed {len(response['FaceRecords'])} faces")
         
         results = []
-        faces_table = dynamodb.Table(DETECTED_FACES_TABLE)
-        
-        for face_detail in response['FaceDetails']:
-            try:
-                # Index face in collection
-                index_response = rekognition.index_faces(
-                    CollectionId=COLLECTION_ID,
-                    Image={'S3Object': {'Bucket': S3_BUCKET, 'Name': s3_key}},
-                    MaxFaces=1,
-                    DetectionAttributes=['DEFAULT']
-                )
-                
-                if not index_response['FaceRecords']:
-                    continue
-                
-                face_id = index_response['FaceRecords'][0]['Face']['FaceId']
-                
-                # Search for matching profiles
-                match_response = rekognition.search_faces(
-                    CollectionId=COLLECTION_ID,
-                    FaceId=face_id,
-                    MaxFaces=1,
-                    FaceMatchThreshold=90.0
-                )
-                
-                matched_profile_id = None
-                confidence = None
-                
-                if match_response['FaceMatches']:
-                    match = match_response['FaceMatches'][0]
-                    matched_face_id = match['Face']['FaceId']
-                    
-                    # Check if matched face belongs to a profile
-                    profiles_table = dynamodb.Table(PROFILES_TABLE)
-                    profile_response = profiles_table.scan(
-                        FilterExpression="face_id = :face_id",
-                        ExpressionAttributeValues={":face_id": matched_face_id}
-                    )
-                    
-                    if profile_response['Items']:
-                        matched_profile_id = profile_response['Items'][0]['profile_id']
-                        confidence = float(match['Similarity'])
-                
-                # Store face data in DynamoDB
-                timestamp = datetime.now().isoformat()
-                
-                # Convert floats to Decimal for DynamoDB
-                bounding_box = {}
-                for key, value in face_detail['BoundingBox'].items():
-                    bounding_box[key] = Decimal(str(value))
-                
-                face_item = {
-                    'detected_face_id': face_id,
-                    'image_id': image_id,
-                    's3_path': s3_uri,
-                    'bounding_box': bounding_box,
-                    'timestamp': timestamp
-                }
-                
-                if matched_profile_id:
-                    face_item['matched_profile_id'] = matched_profile_id
-                
-                if confidence:
-                    face_item['confidence'] = Decimal(str(confidence))
-                
-                faces_table.put_item(Item=face_item)
-                
-                # Create response object with HTTPS URL
-                face_response = DetectedFaceResponse(
-                    detected_face_id=face_id,
-                    image_id=image_id,
-                    s3_path=get_s3_presigned_url(s3_uri),
-                    matched_profile_id=matched_profile_id,
-                    bounding_box=face_detail['BoundingBox'],
-                    confidence=confidence,
-                    timestamp=timestamp
-                )
-                
+        face_items = []
+        # Faces are independent, so process them concurrently; wall time follows the slowest face, not the sum
+        outcomes = await asyncio.gather(
+            *(process_detected_face(face_record, image_id, s3_uri) for face_record in response['FaceRecords']),
+            return_exceptions=True
+        )
+        for processed in outcomes:
+            if isinstance(processed, Exception):
+                logger.error(f"Error processing face: {processed}")
+            elif processed:
+                face_response, face_item = processed
                 results.append(face_response)
-            
-            except Exception as e:
-                logger.error(f"Error processing face: {e}")
+                face_items.append(face_item)
+        
+        # The upload is only recorded when every face was processed; otherwise a re-upload
+        # of the same photo would keep returning the incomplete result
+        complete = not any(isinstance(processed, Exception) for processed in outcomes)
+        store = partial(store_detected_faces, face_items, digest if complete else None, image_id)
+        if any('matched_profile_id' in face_item for face_item in face_items):
+            # Clients refresh /profiles as soon as they see a match, so those writes must land first
+            await run_in_threadpool(store)
+        else:
+            # Otherwise the caller only needs the detected faces, so storing them doesn't hold up the response
+            background_tasks.add_task(store)
         
         return results
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in upload_image: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -275,22 +530,18 @@ async def upload_image(file: UploadFile = File(...), description: str = Form(Non
 async def create_profile(name: str = Form(...), file: UploadFile = File(...)):
     """Create a profile with a reference face image"""
     try:
-        # Read image and upload to S3
-        image_content = await file.read()
+        size = check_upload(file)
         profile_id = str(uuid.uuid4())
         s3_key = f"profiles/{profile_id}.jpg"
-        
-        s3.upload_fileobj(io.BytesIO(image_content), S3_BUCKET, s3_key)
         s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
-        logger.info(f"Uploaded profile image to S3: {s3_uri}")
         
-        # Index face
-        index_response = rekognition.index_faces(
+        index_faces = partial(
+            call_rekognition,
+            rekognition.index_faces,
             CollectionId=COLLECTION_ID,
-            Image={'S3Object': {'Bucket': S3_BUCKET, 'Name': s3_key}},
-            MaxFaces=1,
-            DetectionAttributes=['DEFAULT']
+            MaxFaces=1
         )
+        index_response = await archive_and_index(file, size, s3_key, index_faces)
         
         if not index_response['FaceRecords']:
             raise HTTPException(status_code=400, detail="No face detected in the image")
@@ -308,15 +559,16 @@ async def create_profile(name: str = Form(...), file: UploadFile = File(...)):
             'created_at': timestamp
         }
         
-        profiles_table = dynamodb.Table(PROFILES_TABLE)
-        profiles_table.put_item(Item=profile_item)
+        # Storing the profile and matching it against existing faces are independent, so run them together
+        await asyncio.gather(
+            run_in_threadpool(profiles_table.put_item, Item=profile_item),
+            match_with_detected_faces(face_id, profile_id)
+        )
+        invalidate_profiles_cache()
         logger.info(f"Created profile: {profile_id}")
         
-        # Match with existing faces
-        match_with_detected_faces(face_id, profile_id)
-        
         # Get matched images
-        matched_images = get_matched_images(profile_id)
+        matched_images = await run_in_threadpool(get_matched_images, profile_id)
         https_matched_images = [get_s3_presigned_url(img) for img in matched_images]
         
         # Return profile response
@@ -336,16 +588,24 @@ async def create_profile(name: str = Form(...), file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/profiles", response_model=List[ProfileResponse])
-async def get_profiles():
-    """Get all profiles"""
+async def get_profiles(request: Request, response: Response):
+    """Get all profiles; honours If-None-Match so pollers can skip unchanged listings"""
     try:
-        profiles_table = dynamodb.Table(PROFILES_TABLE)
-        response = profiles_table.scan()
+        # Taken before reading, so a write that lands mid-read changes the next poll's ETag
+        etag = profiles_etag()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        items = await run_in_threadpool(scan_profiles)
+        # One indexed query per profile, all in flight together rather than one after another
+        matched = await asyncio.gather(
+            *(run_in_threadpool(get_matched_images, item['profile_id']) for item in items)
+        )
+        response.headers["ETag"] = etag
         
         profiles = []
-        for item in response.get('Items', []):
+        for item, matched_images in zip(items, matched):
             try:
-                matched_images = get_matched_images(item['profile_id'])
                 https_matched_images = [get_s3_presigned_url(img) for img in matched_images]
                 
                 profile = ProfileResponse(
@@ -370,14 +630,13 @@ async def get_profiles():
 async def get_profile(profile_id: str):
     """Get a specific profile by ID"""
     try:
-        profiles_table = dynamodb.Table(PROFILES_TABLE)
-        response = profiles_table.get_item(Key={"profile_id": profile_id})
+        response = await run_in_threadpool(profiles_table.get_item, Key={"profile_id": profile_id})
         
         if not response.get('Item'):
             raise HTTPException(status_code=404, detail="Profile not found")
         
         item = response['Item']
-        matched_images = get_matched_images(profile_id)
+        matched_images = await run_in_threadpool(get_matched_images, profile_id)
         https_matched_images = [get_s3_presigned_url(img) for img in matched_images]
         
         return ProfileResponse(
@@ -399,16 +658,16 @@ async def get_profile(profile_id: str):
 async def match_faces(profile_id: str):
     """Force re-matching of a profile with detected faces"""
     try:
-        profiles_table = dynamodb.Table(PROFILES_TABLE)
-        response = profiles_table.get_item(Key={"profile_id": profile_id})
+        response = await run_in_threadpool(profiles_table.get_item, Key={"profile_id": profile_id})
         
         if not response.get('Item'):
             raise HTTPException(status_code=404, detail="Profile not found")
         
         item = response['Item']
-        match_with_detected_faces(item['face_id'], profile_id)
+        await match_with_detected_faces(item['face_id'], profile_id)
+        mark_profiles_changed()
         
-        matched_images = get_matched_images(profile_id)
+        matched_images = await run_in_threadpool(get_matched_images, profile_id)
         https_matched_images = [get_s3_presigned_url(img) for img in matched_images]
         
         return ProfileResponse(
@@ -426,43 +685,55 @@ async def match_faces(profile_id: str):
         logger.error(f"Error in match_faces: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def match_with_detected_faces(face_id: str, profile_id: str):
+async def match_with_detected_faces(face_id: str, profile_id: str):
     """Match a profile face with detected faces"""
     try:
         # Search for matches in the collection
-        match_response = rekognition.search_faces(
+        match_response = await call_rekognition(
+            rekognition.search_faces,
             CollectionId=COLLECTION_ID,
             FaceId=face_id,
             MaxFaces=100,
             FaceMatchThreshold=80.0
         )
         
-        faces_table = dynamodb.Table(DETECTED_FACES_TABLE)
-        
-        # Update matched faces
-        for match in match_response.get('FaceMatches', []):
+        def update_match(match):
             matched_face_id = match['Face']['FaceId']
             confidence = Decimal(str(match['Similarity']))
             
-            # Find detected faces with this ID
-            response = faces_table.scan(
-                FilterExpression="detected_face_id = :face_id",
+            # Find detected faces with this ID; it's the table's hash key, so query rather than scan
+            items = paginate(
+                faces_table.query,
+                KeyConditionExpression="detected_face_id = :face_id",
+                ProjectionExpression="image_id",
                 ExpressionAttributeValues={":face_id": matched_face_id}
             )
             
-            for item in response.get('Items', []):
-                # Update with matched profile
-                faces_table.update_item(
-                    Key={
-                        "detected_face_id": matched_face_id,
-                        "image_id": item['image_id']
-                    },
-                    UpdateExpression="SET matched_profile_id = :pid, confidence = :conf",
-                    ExpressionAttributeValues={
-                        ":pid": profile_id,
-                        ":conf": confidence
-                    }
-                )
+            for item in items:
+                # Update with matched profile; faces already matched to it are left alone,
+                # so re-matching a profile doesn't rewrite every face it already owns
+                try:
+                    faces_table.update_item(
+                        Key={
+                            "detected_face_id": matched_face_id,
+                            "image_id": item['image_id']
+                        },
+                        UpdateExpression="SET matched_profile_id = :pid, confidence = :conf",
+                        ConditionExpression="attribute_not_exists(matched_profile_id) OR matched_profile_id <> :pid",
+                        ExpressionAttributeValues={
+                            ":pid": profile_id,
+                            ":conf": confidence
+                        }
+                    )
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+        
+        # Update matched faces concurrently rather than one round trip after another,
+        # on the shared threadpool instead of a per-request executor
+        await asyncio.gather(
+            *(run_in_threadpool(update_match, match) for match in match_response.get('FaceMatches', []))
+        )
         
         logger.info(f"Matched profile {profile_id} with {len(match_response.get('FaceMatches', []))} faces")
         return True
@@ -474,18 +745,29 @@ def match_with_detected_faces(face_id: str, profile_id: str):
 def get_matched_images(profile_id: str):
     """Get images matched to a profile"""
     try:
-        faces_table = dynamodb.Table(DETECTED_FACES_TABLE)
-        response = faces_table.scan(
-            FilterExpression="matched_profile_id = :pid",
-            ExpressionAttributeValues={":pid": profile_id}
-        )
-        
-        # Get unique image paths
-        image_paths = set()
-        for item in response.get('Items', []):
-            if 's3_path' in item:
-                image_paths.add(item['s3_path'])
+        try:
+            # Only the profile's own matches are read, instead of the whole table.
+            # Paths are de-duplicated as pages stream in, keeping first-seen order
+            image_paths = dict.fromkeys(item['s3_path'] for item in paginate(
+                faces_table.query,
+                IndexName=MATCHED_PROFILE_INDEX,
+                KeyConditionExpression="matched_profile_id = :pid",
+                FilterExpression="attribute_exists(s3_path)",
+                ProjectionExpression="s3_path",
+                ExpressionAttributeValues={":pid": profile_id}
+            ))
+        except ClientError as e:
+            # Tables created before the index was added can only be scanned
+            if e.response['Error']['Code'] != 'ValidationException':
+                raise
+            image_paths = dict.fromkeys(item['s3_path'] for item in paginate(
+                faces_table.scan,
+                FilterExpression="matched_profile_id = :pid AND attribute_exists(s3_path)",
+                ProjectionExpression="s3_path",
+                ExpressionAttributeValues={":pid": profile_id}
+            ))
         
+        # DynamoDB has already dropped items without a path
         return list(image_paths)
     
     except Exception as e:
@@ -0,0 +1,203 @@
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from config import settings
+
+# boto3/botocore are imported lazily so importing this module stays cheap
+
+@lru_cache(maxsize=None)
+def _session():
+    """One session per process; clients derived from it are built once and reused"""
+    import boto3
+    return boto3.session.Session(region_name=settings.aws_region)
+
+@lru_cache(maxsize=None)
+def _retry_config():
+    """Let botocore handle throttling and transient errors (exponential backoff with jitter)"""
+    from botocore.config import Config
+    return Config(
+        region_name=settings.aws_region,
+        retries={'max_attempts': 10, 'mode': 'adaptive'},
+        # Table waiters poll from several threads at once; reuse their connections
+        max_pool_connections=len(TABLE_DEFINITIONS),
+        tcp_keepalive=True
+    )
+
+@lru_cache(maxsize=None)
+def _dynamodb():
+    return _session().client('dynamodb', config=_retry_config())
+
+@lru_cache(maxsize=None)
+def _rekognition():
+    return _session().client('rekognition', config=_retry_config())
+
+# Sparse index over detected faces that have been matched to a profile
+MATCHED_PROFILE_INDEX = "matched_profile_id-index"
+# Index resolving a Rekognition face to the profile it was indexed for
+FACE_ID_INDEX = "face_id-index"
+
+# Table schemas
+TABLE_DEFINITIONS = {
+    settings.profiles_table: {
+        "KeySchema": [{'AttributeName': 'profile_id', 'KeyType': 'HASH'}],
+        "AttributeDefinitions": [
+            {'AttributeName': 'profile_id', 'AttributeType': 'S'},
+            {'AttributeName': 'face_id', 'AttributeType': 'S'}
+        ],
+        "GlobalSecondaryIndexes": [{
+            'IndexName': FACE_ID_INDEX,
+            'KeySchema': [{'AttributeName': 'face_id', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'KEYS_ONLY'}
+        }]
+    },
+    settings.detected_faces_table: {
+        "KeySchema": [
+            {'AttributeName': 'detected_face_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'image_id', 'KeyType': 'RANGE'}
+        ],
+        "AttributeDefinitions": [
+            {'AttributeName': 'detected_face_id', 'AttributeType': 'S'},
+            {'AttributeName': 'image_id', 'AttributeType': 'S'},
+            {'AttributeName': 'matched_profile_id', 'AttributeType': 'S'}
+        ],
+        "GlobalSecondaryIndexes": [{
+            'IndexName': MATCHED_PROFILE_INDEX,
+            'KeySchema': [{'AttributeName': 'matched_profile_id', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['s3_path']}
+        }]
+    },
+    settings.uploaded_images_table: {
+        "KeySchema": [{'AttributeName': 'digest', 'KeyType': 'HASH'}],
+        "AttributeDefinitions": [{'AttributeName': 'digest', 'AttributeType': 'S'}]
+    },
+    settings.face_recognition_table: {
+        "KeySchema": [{'AttributeName': 'RekognitionId', 'KeyType': 'HASH'}],
+        "AttributeDefinitions": [{'AttributeName': 'RekognitionId', 'AttributeType': 'S'}]
+    }
+}
+
+def create_table(dynamodb, table_name, definition):
+    """Create an on-demand table, falling back to provisioned capacity where on-demand is unsupported"""
+    from botocore.exceptions import ClientError
+
+    throughput = {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+    indexes = definition.get("GlobalSecondaryIndexes", [])
+    create_kwargs = {
+        'TableName': table_name,
+        'KeySchema': definition["KeySchema"],
+        'AttributeDefinitions': definition["AttributeDefinitions"]
+    }
+    if indexes:
+        create_kwargs['GlobalSecondaryIndexes'] = indexes
+    try:
+        dynamodb.create_table(**create_kwargs, BillingMode='PAY_PER_REQUEST')
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ValidationException':
+            raise
+        print(f"On-demand billing rejected for {table_name}, using provisioned capacity")
+        if indexes:
+            # Provisioned tables need capacity on each index as well
+            create_kwargs['GlobalSecondaryIndexes'] = [
+                dict(index, ProvisionedThroughput=throughput) for index in indexes
+            ]
+        dynamodb.create_table(**create_kwargs, ProvisionedThroughput=throughput)
+
+def _submit(dynamodb, table_name):
+    """Submit create_table without waiting for the table to become ACTIVE;
+    returns whether the table is worth waiting on"""
+    try:
+        print(f"Creating table {table_name}...")
+        create_table(dynamodb, table_name, TABLE_DEFINITIONS[table_name])
+    except dynamodb.exceptions.ResourceInUseException:
+        print(f"Table {table_name} is already being created.")
+    except Exception as e:
+        print(f"Error creating table {table_name}: {e}")
+        return False
+    return True
+
+def _is_deleting(dynamodb, table_name):
+    """Whether a listed table is still being torn down"""
+    try:
+        table = dynamodb.describe_table(TableName=table_name)['Table']
+        return table['TableStatus'] == 'DELETING'
+    except dynamodb.exceptions.ResourceNotFoundException:
+        return False
+
+def _wait(dynamodb, table_name):
+    """Block until the table is ACTIVE; returns whether it got there"""
+    try:
+        waiter = dynamodb.get_waiter('table_exists')
+        waiter.wait(TableName=table_name, WaiterConfig={'Delay': 2, 'MaxAttempts': 60})
+        print(f"Table {table_name} is active.")
+        return True
+    except Exception as e:
+        print(f"Error waiting for table {table_name}: {e}")
+        return False
+
+def provision(tables=tuple(TABLE_DEFINITIONS), dynamodb=None):
+    """Create the given DynamoDB tables, submitting all creates before waiting on any;
+    callers with their own DynamoDB client can pass it in"""
+    dynamodb = dynamodb or _dynamodb()
+
+    # Check existing tables
+    existing_tables = dynamodb.list_tables()['TableNames']
+    print(f"Existing tables: {existing_tables}")
+
+    # Phase 1: submit all creates so the tables provision concurrently
+    waiting = []
+    for table_name in tables:
+        if table_name in existing_tables and _is_deleting(dynamodb, table_name):
+            # Recreating a table mid-delete fails with ResourceInUseException, so let the delete finish first
+            print(f"Table {table_name} is being deleted, waiting before recreating it...")
+            waiter = dynamodb.get_waiter('table_not_exists')
+            waiter.wait(TableName=table_name, WaiterConfig={'Delay': 2, 'MaxAttempts': 60})
+            submitted = _submit(dynamodb, table_name)
+        elif table_name in existing_tables:
+            print(f"Table {table_name} already exists.")
+            submitted = True
+        else:
+            submitted = _submit(dynamodb, table_name)
+        # A rejected create will never become ACTIVE, so don't poll for it
+        if submitted:
+            waiting.append(table_name)
+
+    # Phase 2: wait on every table together. This also covers tables another
+    # run is still creating; waiters on tables that are already ACTIVE return at once
+    active = []
+    if waiting:
+        print("Waiting for tables to become active...")
+        with ThreadPoolExecutor(max_workers=len(waiting)) as executor:
+            active = list(executor.map(lambda name: _wait(dynamodb, name), waiting))
+
+    # The waiters only succeed once TableStatus is ACTIVE, so their results are the verification
+    missing = [name for name in tables if name not in waiting]
+    missing += [name for name, ok in zip(waiting, active) if not ok]
+    if missing:
+        print(f"WARNING: Tables not active after setup: {missing}")
+    else:
+        print("All tables are active.")
+
+def create_rekognition_collection():
+    """Create Rekognition collection if it doesn't exist"""
+    rekognition = _rekognition()
+
+    try:
+        rekognition.create_collection(CollectionId=settings.collection_id)
+        print(f"Created Rekognition collection: {settings.collection_id}")
+    except rekognition.exceptions.ResourceAlreadyExistsException:
+        print(f"Rekognition collection {settings.collection_id} already exists")
+    except Exception as e:
+        print(f"Error creating Rekognition collection: {e}")
+
+def main():
+    print("\n=== Creating DynamoDB Tables and Rekognition Collection ===\n")
+
+    provision()
+    create_rekognition_collection()
+
+    print("\n=== Setup Complete ===\n")
+    print("You can now run the FastAPI application with:")
+    print("uvicorn index:app --reload")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 import streamlit as st
 import requests
-from PIL import Image
-import io
-import base64
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 
 # API URL
@@ -14,40 +17,160 @@ st.title("Face Recognition System")
 # Initialize session state
 if 'profiles' not in st.session_state:
     st.session_state.profiles = []
+    st.session_state.profiles_by_id = {}
 if 'selected_profile' not in st.session_state:
     st.session_state.selected_profile = None
 
-# Function to load profiles
-def load_profiles():
+# Pooled HTTP session so API calls and image downloads reuse connections.
+# Cached as a resource so it survives Streamlit reruns instead of being rebuilt each time
+@st.cache_resource
+def get_session():
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    ))
+    return session
+
+# Store profiles along with an id lookup, so reruns don't rebuild it
+def set_profiles(profiles):
+    st.session_state.profiles = profiles
+    st.session_state.profiles_by_id = {p["profile_id"]: p for p in profiles}
+
+# Last (ETag, body) seen from /profiles, shared across sessions and reruns
+@st.cache_resource
+def _profiles_validator():
+    return {}
+
+# Fetch the profile list, cached briefly; call fetch_profiles.clear() after any mutation.
+# Refetches are conditional, so an unchanged listing comes back as an empty 304
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_profiles():
+    validator = _profiles_validator()
+    headers = {"If-None-Match": validator["etag"]} if "etag" in validator else {}
+    response = get_session().get(f"{BASE_URL}/profiles", headers=headers, timeout=30)
+    if response.status_code == 304:
+        return validator["body"]
+    response.raise_for_status()
+    profiles = response.json()
+    if "ETag" in response.headers:
+        validator.update(etag=response.headers["ETag"], body=profiles)
+    return profiles
+
+# Function to load profiles (refresh=True bypasses the cache)
+def load_profiles(refresh=False):
+    st.session_state._last_profiles_fetch = time.monotonic()
+    if refresh:
+        fetch_profiles.clear()
     try:
-        response = requests.get(f"{BASE_URL}/profiles")
-        if response.status_code == 200:
-            st.session_state.profiles = response.json()
-            return True
-        else:
-            st.error(f"Error loading profiles: {response.text}")
-            return False
+        set_profiles(fetch_profiles())
+        return True
+    except requests.HTTPError as e:
+        st.error(f"Error loading profiles: {e.response.text}")
+        return False
     except Exception as e:
         st.error(f"Error connecting to API: {e}")
         return False
 
-# Function to display image from URL
-def display_image(url, caption=None, width=200):
+# Download image bytes once per URL and reuse them across reruns
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def _fetch_bytes(url):
+    response = get_session().get(url, timeout=5)
+    response.raise_for_status()
+    return response.content
+
+# Download several images concurrently; failed downloads come back as None
+def prefetch_images(urls):
+    def fetch(url):
+        try:
+            return _fetch_bytes(url)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return list(executor.map(fetch, urls))
+
+# Function to display image from URL (or from bytes already prefetched for it)
+def display_image(url, caption=None, width=200, data=None):
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            image = Image.open(BytesIO(response.content))
-            st.image(image, caption=caption, width=width)
-        else:
-            st.warning(f"Could not load image: {url}")
+        if data is None:
+            data = _fetch_bytes(url)
+        # st.image takes encoded bytes directly, so there's no PIL decode to repeat on every rerun
+        st.image(data, caption=caption, width=width)
+    except requests.HTTPError:
+        st.warning(f"Could not load image: {url}")
     except Exception as e:
         st.warning(f"Error displaying image: {e}")
 
+# Font for face labels, loaded once rather than per box
+_FONT = ImageFont.load_default()
+
+# Measure a label once; "Face 1".."Face N" repeat across every render
+@lru_cache(maxsize=256)
+def _label_size(label):
+    left, top, right, bottom = _FONT.getbbox(label)
+    return right - left, bottom - top
+
+# Reduce detected faces to (left, top, width, height, matched) ratio tuples, once per API response.
+# The compact tuple is also a cheap cache key for render_annotated
+def face_boxes(faces):
+    boxes = []
+    for face in faces:
+        box = face["bounding_box"]
+        boxes.append((box["Left"], box["Top"], box["Width"], box["Height"], bool(face.get("matched_profile_id"))))
+    return tuple(boxes)
+
+# Draw every face's bounding box and label in a single pass, in place.
+# Callers pass an image they own; render_annotated's freshly decoded thumbnail is never shared
+def draw_bounding_boxes(image, boxes):
+    annotated = image if image.mode == "RGB" else image.convert("RGB")
+    draw = ImageDraw.Draw(annotated)
+    width, height = annotated.size
+    
+    # Scale every box to pixels up front, then draw
+    pixel_boxes = [
+        (int(left * width), int(top * height), int((left + w) * width), int((top + h) * height), matched)
+        for left, top, w, h, matched in boxes
+    ]
+    
+    for i, (left, top, right, bottom, matched) in enumerate(pixel_boxes):
+        color = "lime" if matched else "red"
+        
+        label = f"Face {i+1}"
+        text_width, text_height = _label_size(label)
+        label_top = max(0, top - text_height - 4)
+        
+        draw.rectangle([left, top, right, bottom], outline=color, width=3)
+        draw.rectangle([left, label_top, left + text_width + 4, label_top + text_height + 4], fill=color)
+        draw.text((left + 2, label_top + 2), label, fill="black", font=_FONT)
+    
+    return annotated
+
+# Longest side of the annotated preview; the full-resolution upload only goes to the API
+PREVIEW_MAX_SIDE = 1024
+
+# Decode, annotate and re-encode only once per (image, face boxes) pair across reruns.
+# Boxes are drawn on a preview-sized thumbnail, so st.image never ships the full-resolution photo
+@st.cache_data(show_spinner=False, max_entries=16)
+def render_annotated(image_bytes, boxes):
+    # Rekognition's boxes are relative to the EXIF-corrected image, so draw on that orientation
+    image = ImageOps.exif_transpose(Image.open(BytesIO(image_bytes)))
+    image.thumbnail((PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE), Image.Resampling.LANCZOS)
+    annotated = draw_bounding_boxes(image, boxes)
+    buffer = BytesIO()
+    annotated.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
 # Sidebar
 st.sidebar.title("Controls")
 
 # Refresh profiles
 if st.sidebar.button("Refresh Profiles"):
+    load_profiles(refresh=True)
+
+# Load profiles once per rerun, retrying an empty or failed load at most every 5s
+if not st.session_state.profiles and time.monotonic() - st.session_state.get("_last_profiles_fetch", 0) > 5:
     load_profiles()
 
 # Create tabs
@@ -57,16 +180,21 @@ tab1, tab2, tab3 = st.tabs(["Create Profile", "View Profiles", "Upload Group Pho
 with tab1:
     st.header("Create a New Profile")
     
-    name = st.text_input("Name")
-    uploaded_file = st.file_uploader("Upload a clear face photo", type=["jpg", "jpeg", "png"])
+    # A form holds the inputs until submit, so editing them doesn't rerun the whole script
+    with st.form("create_profile"):
+        name = st.text_input("Name")
+        uploaded_file = st.file_uploader("Upload a clear face photo", type=["jpg", "jpeg", "png"])
+        submitted = st.form_submit_button("Create Profile")
     
-    if st.button("Create Profile") and name and uploaded_file:
+    if submitted and name and uploaded_file:
         try:
-            files = {"file": uploaded_file}
+            # Read the upload once and share the bytes
+            raw = uploaded_file.getvalue()
+            files = {"file": (uploaded_file.name, raw, uploaded_file.type)}
             data = {"name": name}
             
             with st.spinner("Creating profile..."):
-                response = requests.post(f"{BASE_URL}/profiles", files=files, data=data)
+                response = get_session().post(f"{BASE_URL}/profiles", files=files, data=data)
                 
                 if response.status_code == 200:
                     profile = response.json()
@@ -75,7 +203,7 @@ with tab1:
                     display_image(profile['profile_image_s3'], profile['name'])
                     
                     # Refresh profiles list
-                    load_profiles()
+                    load_profiles(refresh=True)
                 else:
                     st.error(f"Error creating profile: {response.text}")
         except Exception as e:
@@ -85,37 +213,43 @@ with tab1:
 with tab2:
     st.header("View Profiles")
     
-    # Load profiles if not loaded
-    if not st.session_state.profiles:
-        load_profiles()
-    
     if not st.session_state.profiles:
         st.info("No profiles found. Create a profile first.")
     else:
-        # Create profile selection
-        profile_names = [profile["name"] for profile in st.session_state.profiles]
-        selected_name = st.selectbox("Select Profile", profile_names)
+        # Create profile selection, keyed by id so profiles sharing a name stay distinct
+        profiles_by_id = st.session_state.profiles_by_id
+        selected_id = st.selectbox(
+            "Select Profile",
+            list(profiles_by_id),
+            format_func=lambda pid: profiles_by_id[pid]["name"]
+        )
         
         # Find selected profile details
-        selected_profile = next((p for p in st.session_state.profiles if p["name"] == selected_name), None)
+        selected_profile = profiles_by_id.get(selected_id)
         
         if selected_profile:
+            # Fetch the profile image and all matched images in one concurrent batch
+            image_urls = selected_profile["matched_images"]
+            profile_image, *images = prefetch_images([selected_profile["profile_image_s3"]] + image_urls)
+            
             # Display profile details
             col1, col2 = st.columns([1, 2])
             
             with col1:
                 st.subheader("Profile Image")
-                display_image(selected_profile["profile_image_s3"], selected_profile["name"])
+                display_image(selected_profile["profile_image_s3"], selected_profile["name"], data=profile_image)
                 
                 if st.button("Re-match Faces"):
                     with st.spinner("Matching faces..."):
-                        response = requests.post(f"{BASE_URL}/match_faces/{selected_profile['profile_id']}")
+                        response = get_session().post(f"{BASE_URL}/match_faces/{selected_profile['profile_id']}")
                         if response.status_code == 200:
                             updated_profile = response.json()
                             # Update the profile in session state
-                            for i, p in enumerate(st.session_state.profiles):
-                                if p["profile_id"] == updated_profile["profile_id"]:
-                                    st.session_state.profiles[i] = updated_profile
+                            fetch_profiles.clear()
+                            set_profiles([
+                                updated_profile if p["profile_id"] == updated_profile["profile_id"] else p
+                                for p in st.session_state.profiles
+                            ])
                             st.success("Faces re-matched successfully")
                             st.rerun()
                         else:
@@ -123,16 +257,15 @@ with tab2:
             
             with col2:
                 st.subheader("Matched Images")
-                if not selected_profile["matched_images"]:
+                if not image_urls:
                     st.info("No matched images found for this profile")
                 else:
                     # Create a grid for matched images
-                    num_images = len(selected_profile["matched_images"])
-                    cols = st.columns(min(3, num_images))
+                    cols = st.columns(min(3, len(image_urls)))
                     
-                    for i, image_url in enumerate(selected_profile["matched_images"]):
+                    for i, (image_url, data) in enumerate(zip(image_urls, images)):
                         with cols[i % 3]:
-                            display_image(image_url, f"Match {i+1}")
+                            display_image(image_url, f"Match {i+1}", data=data)
 
 # Tab 3: Upload Group Photo
 with tab3:
@@ -142,53 +275,57 @@ with tab3:
     
     if st.button("Detect Faces") and uploaded_group:
         try:
-            files = {"file": uploaded_group}
+            # Read the upload once and share the bytes with the preview below
+            raw = uploaded_group.getvalue()
+            files = {"file": (uploaded_group.name, raw, uploaded_group.type)}
             data = {"description": "Group photo"}
             
             with st.spinner("Detecting faces..."):
-                response = requests.post(f"{BASE_URL}/upload_image", files=files, data=data)
+                response = get_session().post(f"{BASE_URL}/upload_image", files=files, data=data)
                 
                 if response.status_code == 200:
                     detected_faces = response.json()
-                    st.success(f"Detected {len(detected_faces)} faces")
-                    
-                    # Display original image
-                    st.subheader("Uploaded Group Photo")
-                    group_image = Image.open(uploaded_group)
-                    st.image(group_image, width=600)
+                    # Keep the result so it survives reruns triggered by other widgets
+                    st.session_state.group_result = {
+                        "raw": raw,
+                        "faces": detected_faces,
+                        "boxes": face_boxes(detected_faces)
+                    }
                     
-                    # Show detected faces info
-                    st.subheader("Detected Faces")
-                    
-                    if not detected_faces:
-                        st.info("No faces detected in the image")
-                    else:
-                        # Create two columns for each face
-                        for i, face in enumerate(detected_faces):
-                            col1, col2 = st.columns([1, 3])
-                            
-                            with col1:
-                                st.write(f"**Face {i+1}**")
-                                if face.get("matched_profile_id"):
-                                    # Find matching profile name
-                                    matched_profile = next((p for p in st.session_state.profiles if p["profile_id"] == face["matched_profile_id"]), None)
-                                    if matched_profile:
-                                        st.success(f"Matched: {matched_profile['name']}")
-                                        st.write(f"Confidence: {face.get('confidence', 0):.2f}%")
-                                else:
-                                    st.warning("No match found")
-                            
-                            with col2:
-                                # Display the group image where this face was detected
-                                display_image(face["s3_path"], "Group photo")
-                    
-                    # Refresh profiles to update matched images
-                    load_profiles()
+                    # Refresh profiles to update matched images, at most once per 10s
+                    last_fetch = st.session_state.get("_last_profiles_fetch", 0)
+                    if any(f.get("matched_profile_id") for f in detected_faces) and time.monotonic() - last_fetch > 10:
+                        load_profiles(refresh=True)
                 else:
                     st.error(f"Error detecting faces: {response.text}")
         except Exception as e:
             st.error(f"Error: {e}")
-
-# Initial load of profiles
-if not st.session_state.profiles:
-    load_profiles()
\ No newline at end of file
+    
+    group_result = st.session_state.get("group_result")
+    if group_result:
+        detected_faces = group_result["faces"]
+        st.success(f"Detected {len(detected_faces)} faces")
+        
+        # Display the uploaded image with every detected face outlined
+        st.subheader("Uploaded Group Photo")
+        st.image(render_annotated(group_result["raw"], group_result["boxes"]), width=600)
+        
+        # Show detected faces info
+        st.subheader("Detected Faces")
+        
+        if not detected_faces:
+            st.info("No faces detected in the image")
+        else:
+            cols = st.columns(4)
+            
+            for i, face in enumerate(detected_faces):
+                with cols[i % 4]:
+                    st.write(f"**Face {i+1}**")
+                    if face.get("matched_profile_id"):
+                        # Find matching profile name
+                        matched_profile = st.session_state.profiles_by_id.get(face["matched_profile_id"])
+                        if matched_profile:
+                            st.success(f"Matched: {matched_profile['name']}")
+                            st.write(f"Confidence: {face.get('confidence', 0):.2f}%")
+                    else:
+                        st.warning("No match found")
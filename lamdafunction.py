@@ -1,71 +1,118 @@
 from __future__ import print_function
 
 import boto3
+from botocore.config import Config
 from decimal import Decimal
 import json
-import urllib
+import urllib.parse
 
 print('Loading function')
 
-dynamodb = boto3.client('dynamodb')
-s3 = boto3.client('s3')
-rekognition = boto3.client('rekognition')
+# Clients outlive a single invocation in a warm container, so keep their
+# connections alive between events and let botocore back off on throttling
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+dynamodb = boto3.client('dynamodb', config=BOTO_CONFIG)
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+rekognition = boto3.client('rekognition', config=BOTO_CONFIG)
 
 
 # --------------- Helper Functions ------------------
 
-def index_faces(bucket, key):
+# Rekognition rejects an ExternalImageId longer than this
+MAX_EXTERNAL_IMAGE_ID = 255
+
+def external_image_id(fullName):
+    # ExternalImageId only allows [a-zA-Z0-9_.\-:], so percent-encode the name
+    # and write '%' as ':' (which quote() always escapes, so it's reversible).
+    # Encoding can triple the length; names that no longer fit get None
+    encoded = urllib.parse.quote(fullName, safe='').replace('~', '%7E').replace('%', ':')
+    return encoded if len(encoded) <= MAX_EXTERNAL_IMAGE_ID else None
 
+def index_faces(bucket, key, fullName):
+
+    # Carry the name on the face itself, so recognition can read it
+    # straight from the search results without a DynamoDB lookup;
+    # faces without one are resolved through the DynamoDB table instead
+    kwargs = {}
+    imageId = external_image_id(fullName)
+    if imageId:
+        kwargs['ExternalImageId'] = imageId
     response = rekognition.index_faces(
         Image={"S3Object":
             {"Bucket": bucket,
             "Name": key}},
-            CollectionId="famouspersons")
+            CollectionId="famouspersons",
+            **kwargs)
     return response
     
-def update_index(tableName,faceId, fullName):
-    response = dynamodb.put_item(
-        TableName=tableName,
-        Item={
+def update_index_batch(tableName, entries):
+    # Write (faceId, fullName) pairs 25 at a time, the BatchWriteItem limit,
+    # resubmitting anything DynamoDB hands back as unprocessed
+    requests = [
+        {'PutRequest': {'Item': {
             'RekognitionId': {'S': faceId},
             'FullName': {'S': fullName}
-            }
-        ) 
+            }}}
+        for faceId, fullName in entries
+        ]
+    for start in range(0, len(requests), 25):
+        pending = {tableName: requests[start:start + 25]}
+        while pending:
+            response = dynamodb.batch_write_item(RequestItems=pending)
+            pending = response.get('UnprocessedItems', {})
     
 # --------------- Main handler ------------------
 
 def lambda_handler(event, context):
 
-    # Get the object from the event
-    bucket = event['Records'][0]['s3']['bucket']['name']
     print("Records: ",event['Records'])
-    key = event['Records'][0]['s3']['object']['key']
-    print("Key: ",key)
-    # key = key.encode()
-    # key = urllib.parse.unquote_plus(key)
-
-    try:
-
-        # Calls Amazon Rekognition IndexFaces API to detect faces in S3 object 
-        # to index faces into specified collection
-        
-        response = index_faces(bucket, key)
-        
-        # Commit faceId and full name object metadata to DynamoDB
-        
-        if response['ResponseMetadata']['HTTPStatusCode'] == 200:
-            faceId = response['FaceRecords'][0]['Face']['FaceId']
+    responses = []
+    entries = []
+
+    # S3 can deliver several objects in one event; index them all,
+    # then commit their names to DynamoDB together
+    for record in event['Records']:
+        # Get the object from the event
+        bucket = record['s3']['bucket']['name']
+        key = record['s3']['object']['key']
+        print("Key: ",key)
+        # key = key.encode()
+        # key = urllib.parse.unquote_plus(key)
 
+        try:
+
+            # Calls Amazon Rekognition IndexFaces API to detect faces in S3 object 
+            # to index faces into specified collection
+            
             ret = s3.head_object(Bucket=bucket,Key=key)
             personFullName = ret['Metadata']['fullname']
 
-            update_index('face_recognition',faceId,personFullName)
+            response = index_faces(bucket, key, personFullName)
+            
+            if response['ResponseMetadata']['HTTPStatusCode'] == 200:
+                faceId = response['FaceRecords'][0]['Face']['FaceId']
+
+                entries.append((faceId, personFullName))
+
+            # Print response to console
+            print(response)
+            responses.append(response)
+        except Exception as e:
+            print(e)
+            print("Error processing object {} from bucket {}. ".format(key, bucket))
+            # Still commit the records indexed before this one, so a retried
+            # event doesn't leave their faces in the collection without a name
+            if entries:
+                update_index_batch('face_recognition', entries)
+            raise e
 
-        # Print response to console
-        print(response)
+    # Commit faceId and full name object metadata to DynamoDB
+    if entries:
+        update_index_batch('face_recognition', entries)
 
-        return response
-    except Exception as e:
-        print(e)
-        print("Error processing object {} from bucket {}. ".format(key, bucket))
-        raise e
\ No newline at end of file
+    return responses[0] if len(responses) == 1 else responses
\ No newline at end of file
@@ -12,8 +12,9 @@ images=[('image1.jpg','Elon Musk'),
       ]
 
 # Iterate through list to upload objects to S3   
+# upload_file streams each image from disk in chunks (multipart when large)
+# and closes it afterwards, instead of handing put() an open file handle
 for image in images:
-    file = open(image[0],'rb')
     object = s3.Object('famouspersons-images-ca','index/'+ image[0])
-    ret = object.put(Body=file,
-                    Metadata={'FullName':image[1]})
+    object.upload_file(image[0],
+                    ExtraArgs={'Metadata': {'FullName':image[1]}})
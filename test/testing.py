@@ -1,16 +1,26 @@
 import boto3
 import io
-from PIL import Image
+import urllib.parse
+from PIL import Image, ImageOps
 
 rekognition = boto3.client('rekognition', region_name='us-east-1')
 dynamodb = boto3.client('dynamodb', region_name='us-east-1')
 
 image_path = input("Enter path of the image to check: ")
 
-image = Image.open(image_path)
-stream = io.BytesIO()
-image.save(stream,format="JPEG")
-image_binary = stream.getvalue()
+with open(image_path, 'rb') as f:
+    image_binary = f.read()
+
+# Rekognition accepts JPEG and PNG as-is; only re-encode other formats,
+# or images larger than 1280px on their longest side, which are downscaled first
+image = Image.open(io.BytesIO(image_binary))
+if image.format not in ('JPEG', 'PNG') or max(image.size) > 1280:
+    # Re-encoding drops EXIF, so apply the orientation to the pixels first
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((1280, 1280), Image.Resampling.LANCZOS)
+    stream = io.BytesIO()
+    image.save(stream,format="JPEG",quality=85)
+    image_binary = stream.getvalue()
 
 
 response = rekognition.search_faces_by_image(
@@ -18,17 +28,35 @@ response = rekognition.search_faces_by_image(
         Image={'Bytes':image_binary}                                       
         )
 
+# Faces indexed with the name in ExternalImageId need no lookup at all
+# (the indexer writes '%' as ':' to fit Rekognition's allowed characters)
+names = {}
+for match in response['FaceMatches']:
+    if 'ExternalImageId' in match['Face']:
+        names[match['Face']['FaceId']] = urllib.parse.unquote(match['Face']['ExternalImageId'].replace(':', '%'))
+
+# Look up the names of any older faces in one BatchGetItem round trip
+face_ids = list(dict.fromkeys(
+    match['Face']['FaceId'] for match in response['FaceMatches'] if match['Face']['FaceId'] not in names
+    ))
+request_items = {}
+if face_ids:
+    request_items = {'facerecognition': {
+        'Keys': [{'RekognitionId': {'S': face_id}} for face_id in face_ids]
+        }}
+# Throttled reads come back as UnprocessedKeys; resubmit them until none remain
+while request_items:
+    batch = dynamodb.batch_get_item(RequestItems=request_items)
+    for item in batch['Responses'].get('facerecognition', []):
+        names[item['RekognitionId']['S']] = item['FullName']['S']
+    request_items = batch.get('UnprocessedKeys', {})
+
 found = False
 for match in response['FaceMatches']:
     print (match['Face']['FaceId'],match['Face']['Confidence'])
-        
-    face = dynamodb.get_item(
-        TableName='facerecognition',  
-        Key={'RekognitionId': {'S': match['Face']['FaceId']}}
-        )
     
-    if 'Item' in face:
-        print ("Found Person: ",face['Item']['FullName']['S'])
+    if match['Face']['FaceId'] in names:
+        print ("Found Person: ",names[match['Face']['FaceId']])
         found = True
 
 if not found: